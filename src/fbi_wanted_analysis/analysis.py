@@ -1,9 +1,17 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pyarrow as pa
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Iterable
+from urllib3.util.retry import Retry
 import pandas as pd
 
+from fbi_wanted_analysis.cleaning import safe_first_subject
+
 """
 RESEARCH QUESTIONS
 How does the quantity of most wanted cases change over time?
@@ -17,41 +25,73 @@ What do trends in rewards and quantity of wanted persons reveal about law enforc
 """
 
 FBI_WANTED_URL = "https://api.fbi.gov/wanted/v1/list"
+FETCH_WORKERS = 8
+
+# Shared across calls so repeated refreshes reuse open keep-alive connections to api.fbi.gov
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_maxsize=FETCH_WORKERS,
+        max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504)),
+    ),
+)
+
+# Fields kept from each API item; everything else (images, descriptions, ...) is dropped on arrival
+WANTED_FIELDS = (
+    "uid",
+    "title",
+    "publication",
+    "field_offices",
+    "sex",
+    "race",
+    "subjects",
+    "reward_text",
+    "caution",
+    "details",
+)
+
+# Scalar text fields, returned as Arrow-backed strings (list fields such as subjects stay as objects)
+TEXT_FIELDS = ("uid", "title", "publication", "sex", "race", "reward_text", "caution", "details")
+
+
+def _fetch_page(session: requests.Session, page_size: int, page: int) -> list[dict]:
+    params = {"pageSize": page_size, "page": page}
+    r = session.get(FBI_WANTED_URL, params=params, timeout=30)
+    r.raise_for_status()
+    payload = r.json()
+    return payload.get("items", [])
 
 
 def fetch_current_wanted(page_size: int = 200, pages: int = 1) -> pd.DataFrame:
-    rows: list[dict] = []
+    items: list[dict] = []
 
-    for page in range(1, pages + 1):
-        params = {"pageSize": page_size, "page": page}
-        r = requests.get(FBI_WANTED_URL, params=params, timeout=30)
-        r.raise_for_status()
-        payload = r.json()
-        rows.extend(payload.get("items", []))
+    # Pages are independent, so request them concurrently over the pooled session
+    # instead of paying a full round trip (and handshake) per page in sequence.
+    if pages > 0:
+        with ThreadPoolExecutor(max_workers=min(pages, FETCH_WORKERS)) as pool:
+            for page_items in pool.map(lambda page: _fetch_page(_SESSION, page_size, page), range(1, pages + 1)):
+                items.extend(page_items)
 
-    if not rows:
+    if not items:
         return pd.DataFrame()
 
-    df = pd.json_normalize(rows)
-
-    keep = [
-        c
-        for c in df.columns
-        if c
-        in {
-            "uid",
-            "title",
-            "publication",
-            "field_offices",
-            "sex",
-            "race",
-            "subjects",
-            "reward_text",
-            "caution",
-            "details",
-        }
-    ]
-    return df[keep] if keep else df
+    # Build the frame column-at-a-time: one list per kept field (WANTED_FIELDS that appear in any item),
+    # rather than a projected dict per row that pandas then has to transpose.
+    # Arrow string columns hand off to Streamlit's Arrow serialization without an object-to-string conversion.
+    present = set().union(*items)
+    columns = {}
+    for field in WANTED_FIELDS:
+        if field in present:
+            values = [item.get(field) for item in items]
+            columns[field] = values
+            if field in TEXT_FIELDS:
+                # A non-scalar value (e.g. a list-valued race) can't be cast; keep that column as objects
+                try:
+                    columns[field] = pd.array(values, dtype=pd.ArrowDtype(pa.string()))
+                except pa.ArrowException:
+                    pass
+    return pd.DataFrame(columns)
 
 
 def run_analysis_pipeline() -> None:
@@ -59,6 +99,14 @@ def run_analysis_pipeline() -> None:
     print("Running analysis pipeline...")
 
 
+def _parse_snapshot_dates(s: pd.Series) -> pd.Series:
+    # snapshot_date is user-supplied: try the fixed ISO 8601 parser first, then fall back to format inference
+    try:
+        return pd.to_datetime(s, format="ISO8601")
+    except (ValueError, TypeError):
+        return pd.to_datetime(s)
+
+
 # RESEARCH QUESTION 1: How does the quantity of most wanted cases change over time?
 def quantity_over_time(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -69,11 +117,12 @@ def quantity_over_time(df: pd.DataFrame) -> pd.DataFrame:
 
     # Ensure correct types
     df = df.copy()
-    df["snapshot_date"] = pd.to_datetime(df["snapshot_date"])
+    df["snapshot_date"] = _parse_snapshot_dates(df["snapshot_date"])
 
-    # Count unique listings per snapshot
+    # Count unique listings per snapshot. nunique (not size) because snapshot data can repeat a uid,
+    # e.g. once per geography; groups are sorted explicitly below.
     out = (
-        df.groupby("snapshot_date")["uid"]
+        df.groupby("snapshot_date", observed=True, sort=False)["uid"]
           .nunique()
           .reset_index(name="total_listings")
           .sort_values("snapshot_date")
@@ -104,30 +153,34 @@ def geographic_concentration_over_time(
     """
 
     df = df.copy()
-    df["snapshot_date"] = pd.to_datetime(df["snapshot_date"])
+    df["snapshot_date"] = _parse_snapshot_dates(df["snapshot_date"])
 
-    # Drop rows without geography info
-    df = df.dropna(subset=[geography])
+    # Drop rows without geography info; each (snapshot, geography, uid) counts once
+    df = df.dropna(subset=["snapshot_date", geography, "uid"]).drop_duplicates(["snapshot_date", geography, "uid"])
+    if df.empty:
+        return pd.DataFrame(columns=["snapshot_date", geography, "listings", "total", "share"])
 
-    # Count listings per geography per snapshot
-    counts = (
-        df.groupby(["snapshot_date", geography])["uid"]
-          .nunique()
-          .reset_index(name="listings")
-    )
+    # Count listings per geography per snapshot on integer codes: one combined key per row,
+    # counted in a single np.unique pass instead of a pandas groupby
+    snap_codes, snaps = pd.factorize(df["snapshot_date"])
+    geo_codes, geos = pd.factorize(df[geography])
+    keys, listings = np.unique(snap_codes.astype(np.int64) * len(geos) + geo_codes, return_counts=True)
+    snap_idx, geo_idx = np.divmod(keys, len(geos))
 
-    # Compute total listings per snapshot
-    totals = (
-        counts.groupby("snapshot_date")["listings"]
-        .sum()
-        .reset_index(name="total")
-    )
+    # Total listings per snapshot, broadcast back onto each (snapshot, geography) row
+    totals = np.bincount(snap_idx, weights=listings).astype(np.int64)
 
-    # Merge and compute shares
-    out = counts.merge(totals, on="snapshot_date")
-    out["share"] = out["listings"] / out["total"]
+    counts = pd.DataFrame(
+        {
+            "snapshot_date": snaps[snap_idx],
+            geography: geos[geo_idx],
+            "listings": listings,
+            "total": totals[snap_idx],
+        }
+    )
+    counts["share"] = counts["listings"] / counts["total"]
 
-    return out.sort_values(["snapshot_date", "share"], ascending=[True, False])
+    return counts.sort_values(["snapshot_date", "share", geography], ascending=[True, False, True])
 
 
 # RESEARCH QUESTION 3: What types of crimes receive the highest reward amounts?
@@ -150,14 +203,14 @@ def reward_by_crime_type(df: pd.DataFrame) -> pd.DataFrame:
     if "subjects" not in df.columns:
         return pd.DataFrame(columns=["crime_type", "median_reward", "mean_reward", "max_reward", "listings"])
 
-    # Work on a copy
-    rewards = df.copy()
-
-    # Drop rows without subjects
-    rewards = rewards.dropna(subset=["subjects"])
+    # Only these columns are used; exploding just them avoids repeating every other column per subject
+    cols = [c for c in ("uid", "subjects", "reward_amount_max_usd") if c in df.columns]
 
     # Expand subject lists so each crime type is counted separately
-    rewards = rewards.explode("subjects")
+    rewards = df[cols].explode("subjects")
+
+    # Drop rows without subjects (missing values and empty lists both explode to NA)
+    rewards = rewards.dropna(subset=["subjects"])
 
     # Clean subject labels
     rewards["subjects"] = rewards["subjects"].astype(str).str.strip()
@@ -171,7 +224,7 @@ def reward_by_crime_type(df: pd.DataFrame) -> pd.DataFrame:
 
     # Aggregate reward statistics by crime type
     out = (
-        rewards.groupby("subjects")["reward_amount_max_usd"]
+        rewards.groupby("subjects", sort=False)["reward_amount_max_usd"]
         .agg(
             median_reward="median",
             mean_reward="mean",
@@ -182,8 +235,8 @@ def reward_by_crime_type(df: pd.DataFrame) -> pd.DataFrame:
         .rename(columns={"subjects": "crime_type"})
     )
 
-    # Sort with higher median reward first, then by listings
-    out = out.sort_values(["median_reward", "listings"], ascending=[False, False])
+    # Sort with higher median reward first, then by listings (name breaks ties, since groups are unsorted)
+    out = out.sort_values(["median_reward", "listings", "crime_type"], ascending=[False, False, True])
 
     return out
 
@@ -198,28 +251,36 @@ def _to_datetime_series(s: pd.Series) -> pd.Series:
     return pd.to_datetime(s, errors="coerce", utc=True)
 
 
-def _add_time_grain(df: pd.DataFrame, date_col: str, freq: str = "M") -> pd.DataFrame:
+_DATETIME64_GRAIN_UNITS = {"D": "D", "M": "M", "Y": "Y"}
+
+
+def time_grain(df: pd.DataFrame, date_col: str = "publication", freq: str = "M") -> pd.Series:
     """
-    Adds a 'period' column based on date_col. freq: "D", "W", "M", "Q", "Y".
-    Returns a copy with:
-      - period (timestamp at start of period)
+    Bins date_col into periods. freq: "D", "W", "M", "Q", "Y".
+    Returns a Series named 'period' (timestamp at start of period), aligned to df.index.
+    Compute it once and pass it as `period=` to the trend functions to reuse it.
     """
-    out = df.copy()
-    if date_col not in out.columns:
-        out["period"] = pd.NaT
-        return out
+    if date_col not in df.columns:
+        return pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]", name="period")
 
-    dt = _to_datetime_series(out[date_col])
-    out["period"] = dt.dt.to_period(freq).dt.to_timestamp()
-    return out
+    # Bin on UTC wall-clock time (what to_period used after dropping the timezone)
+    dt = _to_datetime_series(df[date_col]).dt.tz_localize(None)
+
+    # Day/month/year starts are a plain datetime64 truncation, with no Period objects in between
+    unit = _DATETIME64_GRAIN_UNITS.get(freq)
+    if unit is not None:
+        values = dt.to_numpy().astype(f"datetime64[{unit}]").astype("datetime64[ns]")
+        return pd.Series(values, index=df.index, name="period")
 
+    # Weeks and quarters have no datetime64 unit
+    return dt.dt.to_period(freq).dt.to_timestamp().rename("period")
 
-def _safe_first_subject(x) -> str:
-    if isinstance(x, list) and len(x) > 0 and isinstance(x[0], str) and x[0].strip():
-        return x[0].strip()
-    if isinstance(x, str) and x.strip():
-        return x.strip()
-    return "Unknown"
+
+def _resolve_period(df: pd.DataFrame, date_col: str, freq: str, period: pd.Series | None) -> pd.Series:
+    # A precomputed period may cover a larger frame (e.g. before filtering); align it to this one
+    if period is None:
+        return time_grain(df, date_col=date_col, freq=freq)
+    return period.reindex(df.index)
 
 
 def _ensure_reward_cols(df: pd.DataFrame) -> None:
@@ -235,6 +296,16 @@ def _ensure_reward_cols(df: pd.DataFrame) -> None:
         )
 
 
+def _numeric_reward_max(df: pd.DataFrame) -> pd.Series:
+    """
+    reward_amount_max_usd as float, NaN wherever no numeric amount was parsed.
+    Reward stats only count numeric rewards, so masking the rest lets one groupby
+    compute counts and amount stats together.
+    """
+    has_amount = df["reward_has_amount"].fillna(False).astype(bool)
+    return pd.to_numeric(df["reward_amount_max_usd"], errors="coerce").where(has_amount)
+
+
 # -----------------------------
 # Main analysis functions
 # -----------------------------
@@ -242,19 +313,20 @@ def rq4_volume_trend(
     df: pd.DataFrame,
     date_col: str = "publication",
     freq: str = "M",
+    period: pd.Series | None = None,
 ) -> pd.DataFrame:
     """
     Trend in number of listings over time.
+    Pass `period` (from time_grain) to skip re-binning date_col.
 
     Returns columns:
       period, listings
     """
-    tmp = _add_time_grain(df, date_col=date_col, freq=freq)
-    tmp = tmp.dropna(subset=["period"])
-    if tmp.empty:
+    period = _resolve_period(df, date_col, freq, period).dropna()
+    if period.empty:
         return pd.DataFrame(columns=["period", "listings"])
 
-    out = tmp.groupby("period").size().reset_index(name="listings").sort_values("period")
+    out = period.groupby(period).size().reset_index(name="listings").sort_values("period")
     return out
 
 
@@ -262,9 +334,11 @@ def rq4_reward_trend(
     df: pd.DataFrame,
     date_col: str = "publication",
     freq: str = "M",
+    period: pd.Series | None = None,
 ) -> pd.DataFrame:
     """
     Trend in reward presence + reward amounts over time.
+    Pass `period` (from time_grain) to skip re-binning date_col.
 
     Returns columns:
       period,
@@ -277,9 +351,10 @@ def rq4_reward_trend(
     """
     _ensure_reward_cols(df)
 
-    tmp = _add_time_grain(df, date_col=date_col, freq=freq)
-    tmp = tmp.dropna(subset=["period"])
-    if tmp.empty:
+    period = _resolve_period(df, date_col, freq, period)
+    keep = period.notna().to_numpy()
+    period = period[keep]
+    if period.empty:
         return pd.DataFrame(
             columns=[
                 "period",
@@ -292,45 +367,38 @@ def rq4_reward_trend(
             ]
         )
 
-    # Ensure numeric
-    reward_max = pd.to_numeric(tmp["reward_amount_max_usd"], errors="coerce")
-
-    def p90(x: pd.Series) -> float | None:
-        x = pd.to_numeric(x, errors="coerce").dropna()
-        if x.empty:
-            return None
-        return float(x.quantile(0.90))
-
-    g = tmp.groupby("period", dropna=False)
-
-    out = pd.DataFrame(
+    rows = df.loc[keep, ["reward_has_text", "reward_has_amount", "reward_amount_max_usd"]]
+    tmp = pd.DataFrame(
         {
-            "period": g.size().index,
-            "listings": g.size().values,
-            "pct_with_reward_text": (g["reward_has_text"].mean().values * 100.0),
-            "pct_with_numeric_reward": (g["reward_has_amount"].mean().values * 100.0),
+            "reward_has_text": rows["reward_has_text"],
+            "reward_has_amount": rows["reward_has_amount"],
+            "reward_numeric_usd": _numeric_reward_max(rows),
         }
     )
 
-    # Reward stats computed only on numeric rewards
-    tmp_numeric = tmp[tmp["reward_has_amount"].fillna(False)].copy()
-    if tmp_numeric.empty:
-        out["median_reward_max_usd"] = pd.NA
-        out["p90_reward_max_usd"] = pd.NA
-        out["max_reward_max_usd"] = pd.NA
-        return out.sort_values("period")
-
-    tmp_numeric["reward_amount_max_usd"] = pd.to_numeric(tmp_numeric["reward_amount_max_usd"], errors="coerce")
-    gn = tmp_numeric.groupby("period")
-
-    med = gn["reward_amount_max_usd"].median()
-    mx = gn["reward_amount_max_usd"].max()
-    p90s = gn["reward_amount_max_usd"].apply(p90)
-
-    out = out.merge(med.rename("median_reward_max_usd"), on="period", how="left")
-    out = out.merge(p90s.rename("p90_reward_max_usd"), on="period", how="left")
-    out = out.merge(mx.rename("max_reward_max_usd"), on="period", how="left")
-
+    g = tmp.groupby(period)
+    out = g.agg(
+        listings=("reward_has_text", "size"),
+        pct_with_reward_text=("reward_has_text", "mean"),
+        pct_with_numeric_reward=("reward_has_amount", "mean"),
+        median_reward_max_usd=("reward_numeric_usd", "median"),
+        max_reward_max_usd=("reward_numeric_usd", "max"),
+    )
+    out["pct_with_reward_text"] *= 100.0
+    out["pct_with_numeric_reward"] *= 100.0
+    out["p90_reward_max_usd"] = g["reward_numeric_usd"].quantile(0.90)
+
+    out = out.reset_index()[
+        [
+            "period",
+            "listings",
+            "pct_with_reward_text",
+            "pct_with_numeric_reward",
+            "median_reward_max_usd",
+            "p90_reward_max_usd",
+            "max_reward_max_usd",
+        ]
+    ]
     return out.sort_values("period")
 
 
@@ -350,15 +418,17 @@ def rq4_priority_by_subject(
     _ensure_reward_cols(df)
 
     tmp = df.copy()
-    if "subjects" in tmp.columns:
-        tmp["subject_primary"] = tmp["subjects"].apply(_safe_first_subject)
-    else:
-        tmp["subject_primary"] = "Unknown"
+    # clean_wanted() already derives subject_primary; fall back for frames that skipped it
+    if "subject_primary" not in tmp.columns:
+        if "subjects" in tmp.columns:
+            tmp["subject_primary"] = tmp["subjects"].apply(safe_first_subject)
+        else:
+            tmp["subject_primary"] = "Unknown"
 
     # numeric reward subset for median stats
     tmp["reward_amount_max_usd"] = pd.to_numeric(tmp.get("reward_amount_max_usd", pd.NA), errors="coerce")
 
-    g = tmp.groupby("subject_primary")
+    g = tmp.groupby("subject_primary", observed=True)
 
     listings = g.size().rename("listings")
     pct_numeric = (g["reward_has_amount"].mean() * 100.0).rename("pct_numeric_reward")
@@ -367,7 +437,11 @@ def rq4_priority_by_subject(
     if numeric.empty:
         med = pd.Series(dtype="float64", name="median_reward_max_usd")
     else:
-        med = numeric.groupby("subject_primary")["reward_amount_max_usd"].median().rename("median_reward_max_usd")
+        med = (
+            numeric.groupby("subject_primary", observed=True)["reward_amount_max_usd"]
+            .median()
+            .rename("median_reward_max_usd")
+        )
 
     out = pd.concat([listings, pct_numeric, med], axis=1).reset_index().rename(columns={"subject_primary": "subject"})
 
@@ -388,28 +462,27 @@ def rq4_priority_by_program(
     """
     _ensure_reward_cols(df)
 
-    tmp = df.copy()
-    tmp["reward_amount_max_usd"] = pd.to_numeric(tmp["reward_amount_max_usd"], errors="coerce")
-
-    g = tmp.groupby("reward_program", dropna=False)
-
-    out = pd.DataFrame(
+    tmp = pd.DataFrame(
         {
-            "reward_program": g.size().index.astype(str),
-            "listings_with_text": g["reward_has_text"].sum().values,
-            "listings_with_amount": g["reward_has_amount"].sum().values,
+            "reward_program": df["reward_program"],
+            "reward_has_text": df["reward_has_text"],
+            "reward_has_amount": df["reward_has_amount"],
+            "reward_numeric_usd": _numeric_reward_max(df),
         }
     )
 
-    numeric = tmp[tmp["reward_has_amount"].fillna(False)].copy()
-    if numeric.empty:
-        out["median_reward_max_usd"] = pd.NA
-        out["max_reward_max_usd"] = pd.NA
-        return out.sort_values("listings_with_amount", ascending=False)
-
-    gn = numeric.groupby("reward_program")
-    out = out.merge(gn["reward_amount_max_usd"].median().rename("median_reward_max_usd"), on="reward_program", how="left")
-    out = out.merge(gn["reward_amount_max_usd"].max().rename("max_reward_max_usd"), on="reward_program", how="left")
+    # observed=True: a categorical reward_program should not report programs absent from this frame
+    out = (
+        tmp.groupby("reward_program", dropna=False, observed=True)
+        .agg(
+            listings_with_text=("reward_has_text", "sum"),
+            listings_with_amount=("reward_has_amount", "sum"),
+            median_reward_max_usd=("reward_numeric_usd", "median"),
+            max_reward_max_usd=("reward_numeric_usd", "max"),
+        )
+        .reset_index()
+    )
+    out["reward_program"] = out["reward_program"].astype(str)
 
     return out.sort_values("listings_with_amount", ascending=False)
 
@@ -422,30 +495,40 @@ def rq4_priority_by_field_office(
     Field office concentration + reward intensity.
 
     Note: field_offices sometimes comes as a list. This function explodes it.
+    Uses the field_offices_list column from clean_wanted() when present, so joined
+    office strings still count once per office.
 
     Returns columns:
       field_office, listings, pct_numeric_reward, median_reward_max_usd
     """
     _ensure_reward_cols(df)
 
-    tmp = df.copy()
-    if "field_offices" not in tmp.columns:
+    if "field_offices_list" in df.columns:
+        cols = ["field_offices_list", "reward_has_amount", "reward_amount_max_usd"]
+        tmp = df[cols].rename(columns={"field_offices_list": "field_office"}).explode("field_office")
+        tmp["field_office"] = tmp["field_office"].fillna("Unknown")
+    elif "field_offices" in df.columns:
+        tmp = df.copy()
+
+        # Normalize to list then explode
+        def to_list(x):
+            if isinstance(x, list):
+                return x
+            if isinstance(x, str) and x.strip():
+                return [x.strip()]
+            return ["Unknown"]
+
+        tmp["field_office"] = tmp["field_offices"].astype(object).apply(to_list)
+        tmp = tmp.explode("field_office")
+    else:
         return pd.DataFrame(columns=["field_office", "listings", "pct_numeric_reward", "median_reward_max_usd"])
 
-    # Normalize to list then explode
-    def to_list(x):
-        if isinstance(x, list):
-            return x
-        if isinstance(x, str) and x.strip():
-            return [x.strip()]
-        return ["Unknown"]
-
-    tmp["field_office"] = tmp["field_offices"].apply(to_list)
-    tmp = tmp.explode("field_office")
+    # Group on integer category codes rather than hashing office strings
+    tmp["field_office"] = tmp["field_office"].astype("category")
 
     tmp["reward_amount_max_usd"] = pd.to_numeric(tmp["reward_amount_max_usd"], errors="coerce")
 
-    g = tmp.groupby("field_office")
+    g = tmp.groupby("field_office", observed=True)
 
     listings = g.size().rename("listings")
     pct_numeric = (g["reward_has_amount"].mean() * 100.0).rename("pct_numeric_reward")
@@ -454,7 +537,11 @@ def rq4_priority_by_field_office(
     if numeric.empty:
         med = pd.Series(dtype="float64", name="median_reward_max_usd")
     else:
-        med = numeric.groupby("field_office")["reward_amount_max_usd"].median().rename("median_reward_max_usd")
+        med = (
+            numeric.groupby("field_office", observed=True)["reward_amount_max_usd"]
+            .median()
+            .rename("median_reward_max_usd")
+        )
 
     out = pd.concat([listings, pct_numeric, med], axis=1).reset_index()
     out = out.sort_values(["listings", "median_reward_max_usd"], ascending=[False, False]).head(top_n)
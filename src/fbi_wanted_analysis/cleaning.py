@@ -1,23 +1,96 @@
 from __future__ import annotations
 from fbi_wanted_analysis.rewards import parse_reward
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+
+
+# Tag lists (subjects, field offices) as an Arrow list<string>: one offsets array plus one string buffer
+# instead of a Python list per row
+TAG_LIST_DTYPE = pd.ArrowDtype(pa.list_(pa.string()))
+
+
+# Column names produced by parse_reward, in order
+_REWARD_COLUMNS = list(parse_reward(None))
+
+
+# Tag sequences as they reach us: Python lists from the API, numpy arrays from .map/.apply over an
+# Arrow list column (e.g. a frame that already went through clean_wanted)
+_TAG_SEQUENCE_TYPES = (list, tuple, np.ndarray)
+
+
+def safe_first_subject(x) -> str:
+    if isinstance(x, _TAG_SEQUENCE_TYPES) and len(x) > 0 and isinstance(x[0], str) and x[0].strip():
+        return x[0].strip()
+    if isinstance(x, str) and x.strip():
+        return x.strip()
+    return "Unknown"
+
+
+def _as_str_list(x) -> list[str] | None:
+    if isinstance(x, _TAG_SEQUENCE_TYPES):
+        # Drop missing tags rather than letting str() turn them into "None"/"nan"
+        return [str(v) for v in x if isinstance(v, str) or (pd.api.types.is_scalar(v) and not pd.isna(v))]
+    if isinstance(x, str):
+        return [x] if x.strip() else []
+    return None
+
+
+def _to_tag_list(col: pd.Series) -> pd.Series:
+    return pd.Series(pd.array([_as_str_list(x) for x in col], dtype=TAG_LIST_DTYPE), index=col.index)
 
 
 def clean_wanted(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
 
     if "publication" in df.columns:
-        df["publication"] = pd.to_datetime(df["publication"], errors="coerce")
+        # FBI publication timestamps are ISO 8601; naming the format skips per-value format inference.
+        # The fixed-format parser rejects str subclasses such as numpy.str_, so fall back to inference
+        try:
+            df["publication"] = pd.to_datetime(df["publication"], format="ISO8601", errors="coerce")
+        except TypeError:
+            df["publication"] = pd.to_datetime(df["publication"], errors="coerce")
 
     if "field_offices" in df.columns:
-        df["field_offices"] = df["field_offices"].apply(
-            lambda x: ", ".join(x) if isinstance(x, list) else (x if pd.notna(x) else "")
-        )
+        # Join only the list rows; everything else is already a string or missing.
+        # As object first: a categorical column (e.g. clean_wanted output) can't take "" as a new value
+        offices = df["field_offices"].astype(object)
+        # Keep the individual offices too, so per-office summaries explode this instead of re-splitting the string
+        df["field_offices_list"] = _to_tag_list(offices)
+        is_list = offices.map(type).eq(list)
+        df["field_offices"] = offices.where(~is_list, offices[is_list].map(lambda x: ", ".join(_as_str_list(x)))).fillna("")
+
+    # fetch_current_wanted leaves a text field as objects when a value isn't a scalar (e.g. a list-valued race);
+    # join those like field_offices so the category cast below has hashable labels
+    for col in ("sex", "race"):
+        if col in df.columns and df[col].dtype == object:
+            values = df[col]
+            is_seq = values.map(lambda x: isinstance(x, _TAG_SEQUENCE_TYPES))
+            df[col] = values.where(~is_seq, values[is_seq].map(lambda x: ", ".join(_as_str_list(x))))
+
+    # Low-cardinality labels: store as category so comparisons and counts work on integer codes
+    for col in ("sex", "race", "field_offices"):
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+
+    if "subjects" in df.columns:
+        # First subject tag, derived once here so per-subject summaries group on it directly
+        df["subject_primary"] = df["subjects"].map(safe_first_subject).astype("category")
+        df["subjects"] = _to_tag_list(df["subjects"])
 
     if "reward_text" in df.columns:
-        parsed = df["reward_text"].apply(parse_reward).apply(pd.Series)
+        # Build the parsed columns from the list of dicts in one go; .apply(pd.Series) built a Series per row
+        # (columns named up front so an empty frame still gets them)
+        parsed = pd.DataFrame(
+            df["reward_text"].map(parse_reward).tolist(), index=df.index, columns=_REWARD_COLUMNS
+        )
+        # Amounts as float64 with NaN for "no amount", so median/max run as NumPy reductions instead of over objects
+        for col in ("reward_amount_min_usd", "reward_amount_max_usd"):
+            parsed[col] = pd.to_numeric(parsed[col], errors="coerce").astype("float64")
         df = pd.concat([df, parsed], axis=1)
+        # Only a handful of program labels, so it joins the other categorical labels
+        df["reward_program"] = df["reward_program"].astype("category")
 
     return df
 
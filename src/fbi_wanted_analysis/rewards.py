@@ -21,17 +21,18 @@ _AMOUNT_RE = re.compile(
 )
 
 _TAG_RE = re.compile(r"<[^>]+>")  # strip simple HTML tags
+_WS_RE = re.compile(r"\s+")  # collapse runs of whitespace
 
 
 def _normalize_reward_text(x: Any) -> str:
-    if x is None or (isinstance(x, float) and pd.isna(x)):
+    if x is None or x is pd.NA or (isinstance(x, float) and pd.isna(x)):
         return ""
     s = str(x).strip()
     if not s:
         return ""
     s = html.unescape(s)
     s = _TAG_RE.sub(" ", s)
-    s = re.sub(r"\s+", " ", s).strip()
+    s = _WS_RE.sub(" ", s).strip()
     return s
 
 
@@ -60,11 +61,9 @@ def parse_reward(reward_text: Any) -> dict[str, Any]:
     txt = _normalize_reward_text(reward_text)
 
     has_text = bool(txt)
-    is_up_to = "up to" in txt.lower()
-    low = txt.lower()
+    low = txt.lower()  # lowercased once; every keyword check below is a plain substring search
     is_up_to = "up to" in low
-    mentions_additional = "additional reward" in low or "additional " in low
-
+    mentions_additional = "additional " in low  # also covers "additional reward"
 
     amounts: list[int] = []
     for m in _AMOUNT_RE.finditer(txt):
@@ -75,10 +74,9 @@ def parse_reward(reward_text: Any) -> dict[str, Any]:
     has_amount = len(amounts) > 0
 
     program = "Other/Unknown"
-    low = txt.lower()
     if "rewards for justice" in low:
         program = "Rewards for Justice"
-    elif "department of state" in low or "united states department of state" in low:
+    elif "department of state" in low:  # also covers "united states department of state"
         program = "State Department"
     elif "department of defense" in low:
         program = "DoD"
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 
@@ -13,6 +14,7 @@ from fbi_wanted_analysis.analysis import (
     rq4_priority_by_subject,
     rq4_reward_trend,
     rq4_volume_trend,
+    time_grain,
 )
 from fbi_wanted_analysis.cleaning import clean_wanted
 
@@ -21,27 +23,20 @@ from fbi_wanted_analysis.cleaning import clean_wanted
 # Small helpers (UI safe)
 # -----------------------------
 def _get_unique_subjects(series: pd.Series) -> list[str]:
-    vals: set[str] = set()
-    for x in series.dropna():
-        if isinstance(x, list):
-            for item in x:
-                if isinstance(item, str) and item.strip():
-                    vals.add(item.strip())
-        elif isinstance(x, str) and x.strip():
-            vals.add(x.strip())
-    return sorted(vals)
+    # Lists explode to one tag per row; plain strings pass through. Keep only string tags before .str,
+    # which raises when no value is a string
+    tags = series.dropna().explode()
+    tags = tags[tags.map(type).eq(str)].astype(str).str.strip()
+    return sorted(tags[tags != ""].unique())
 
 
-def _safe_contains(series: pd.Series, needle: str) -> pd.Series:
-    return series.fillna("").astype(str).str.contains(needle, case=False, na=False)
+def _lower_text(series: pd.Series) -> pd.Series:
+    return series.astype(object).fillna("").astype(str).str.lower()
 
 
-def _first_subject(x) -> str:
-    if isinstance(x, list) and len(x) > 0 and isinstance(x[0], str) and x[0].strip():
-        return x[0].strip()
-    if isinstance(x, str) and x.strip():
-        return x.strip()
-    return "Unknown"
+def _safe_contains(series_lc: pd.Series, needle: str) -> pd.Series:
+    # series_lc is already lowercased, so a literal substring search replaces a case-insensitive regex
+    return series_lc.str.contains(needle.lower(), regex=False, na=False)
 
 
 def _normalize_field_offices_for_filter(col: pd.Series) -> pd.Series:
@@ -56,6 +51,24 @@ def _normalize_field_offices_for_filter(col: pd.Series) -> pd.Series:
     return col.apply(to_text)
 
 
+def _field_office_tags(col: pd.Series) -> pd.Series:
+    # One row per field office tag (index = listing), as a category so counts run on integer codes
+    offices = col
+    if not isinstance(col.dtype, pd.ArrowDtype):  # Arrow list columns from clean_wanted explode directly
+        offices = col.astype(object).apply(lambda x: x if isinstance(x, list) else ([] if x is None else [str(x)]))
+    offices = offices.explode().fillna("").astype(str).str.strip()
+    return offices[offices != ""].astype("category")
+
+
+# -----------------------------
+# Data loading
+# -----------------------------
+@st.cache_data(ttl=3600, show_spinner=False)
+def _load_wanted(page_size: int, pages: int) -> pd.DataFrame:
+    # Cached across reruns and sessions; keyed on (page_size, pages) and cleared by "Refresh data"
+    return clean_wanted(fetch_current_wanted(page_size=page_size, pages=pages))
+
+
 # -----------------------------
 # Main app
 # -----------------------------
@@ -95,8 +108,41 @@ def main() -> None:
     # Fetch + cache
     # -----------------------------
     if refresh or "df" not in st.session_state:
-        df_raw = fetch_current_wanted(page_size=50, pages=pages)
-        st.session_state["df"] = clean_wanted(df_raw)
+        if refresh:
+            _load_wanted.clear()
+        loaded = _load_wanted(page_size=50, pages=pages)
+
+        # Normalize publication datetime once per load (prevents .dt errors)
+        if "publication" in loaded.columns:
+            publication = loaded["publication"]
+            # clean_wanted() has already parsed it; only a raw ISO 8601 string column needs parsing here
+            if pd.api.types.is_datetime64_any_dtype(publication):
+                loaded["publication_dt"] = publication
+            else:
+                loaded["publication_dt"] = pd.to_datetime(publication, format="ISO8601", errors="coerce")
+        else:
+            loaded["publication_dt"] = pd.NaT
+        st.session_state["df"] = loaded
+        # Monthly bins are shared by RQ1 and the default RQ4 grain; the trend functions align them to `filtered`
+        st.session_state["publication_month"] = time_grain(loaded, date_col="publication_dt", freq="M")
+
+        # Search text and subject lookups only change when the data does, so build them once per load
+        empty = pd.Series(dtype="object")
+        st.session_state["title_lc"] = _lower_text(loaded["title"]) if "title" in loaded.columns else empty
+        if "field_offices" in loaded.columns:
+            st.session_state["field_offices_lc"] = _lower_text(_normalize_field_offices_for_filter(loaded["field_offices"]))
+            st.session_state["field_offices_tags"] = _field_office_tags(
+                loaded["field_offices_list"] if "field_offices_list" in loaded.columns else loaded["field_offices"]
+            )
+        else:
+            st.session_state["field_offices_lc"] = empty
+            st.session_state["field_offices_tags"] = empty
+        if "subjects" in loaded.columns:
+            st.session_state["subjects_index"] = _get_unique_subjects(loaded["subjects"])
+            st.session_state["subjects_exploded"] = loaded["subjects"].explode()
+        else:
+            st.session_state["subjects_index"] = []
+            st.session_state["subjects_exploded"] = empty
 
     df: pd.DataFrame = st.session_state["df"]
 
@@ -104,13 +150,6 @@ def main() -> None:
         st.error("No data returned from the FBI API.")
         return
 
-    # Normalize publication datetime once (prevents .dt errors)
-    df = df.copy()
-    if "publication" in df.columns:
-        df["publication_dt"] = pd.to_datetime(df["publication"], errors="coerce")
-    else:
-        df["publication_dt"] = pd.NaT
-
     # -----------------------------
     # Date range + subjects selector (sidebar)
     # -----------------------------
@@ -133,67 +172,71 @@ def main() -> None:
 
         subjects_selected: list[str] = []
         if "subjects" in df.columns:
-            all_subjects = _get_unique_subjects(df["subjects"])
+            all_subjects = st.session_state["subjects_index"]
             if all_subjects:
                 subjects_selected = st.multiselect("Subjects", all_subjects, default=[])
 
     # -----------------------------
     # Apply filters (live)
     # -----------------------------
-    filtered = df.copy()
+    # Each active filter narrows one boolean mask over the full frame in place;
+    # rows are selected once at the end.
+    mask = np.ones(len(df), dtype=bool)
 
-    if title_keyword.strip() and "title" in filtered.columns:
-        filtered = filtered[_safe_contains(filtered["title"], title_keyword.strip())]
+    if title_keyword.strip() and "title" in df.columns:
+        mask &= _safe_contains(st.session_state["title_lc"], title_keyword.strip()).to_numpy(dtype=bool)
 
-    if office_search.strip() and "field_offices" in filtered.columns:
-        fo_text = _normalize_field_offices_for_filter(filtered["field_offices"])
-        filtered = filtered[_safe_contains(fo_text, office_search.strip())]
+    if office_search.strip() and "field_offices" in df.columns:
+        mask &= _safe_contains(st.session_state["field_offices_lc"], office_search.strip()).to_numpy(dtype=bool)
 
-    if sex_filter != "All" and "sex" in filtered.columns:
+    if sex_filter != "All" and "sex" in df.columns:
         if sex_filter == "Unknown":
-            filtered = filtered[filtered["sex"].isna() | (filtered["sex"] == "")]
+            mask &= (df["sex"].isna() | (df["sex"] == "")).to_numpy(dtype=bool)
         else:
-            filtered = filtered[filtered["sex"] == sex_filter]
+            mask &= (df["sex"] == sex_filter).to_numpy(dtype=bool)
 
     if reward_filter != "Any":
         has_text = (
-            filtered["reward_text"].notna() & (filtered["reward_text"].astype(str).str.strip() != "")
-            if "reward_text" in filtered.columns
-            else pd.Series(False, index=filtered.index)
+            df["reward_text"].notna() & (df["reward_text"].astype(str).str.strip() != "")
+            if "reward_text" in df.columns
+            else pd.Series(False, index=df.index)
         )
         has_amount = (
-            filtered["reward_has_amount"].fillna(False)
-            if "reward_has_amount" in filtered.columns
-            else pd.Series(False, index=filtered.index)
+            df["reward_has_amount"].fillna(False)
+            if "reward_has_amount" in df.columns
+            else pd.Series(False, index=df.index)
         )
 
         if reward_filter == "Has reward text":
-            filtered = filtered[has_text]
+            mask &= has_text.to_numpy(dtype=bool)
         elif reward_filter == "No reward text":
-            filtered = filtered[~has_text]
+            mask &= (~has_text).to_numpy(dtype=bool)
         elif reward_filter == "Has numeric amount":
-            filtered = filtered[has_amount]
+            mask &= has_amount.to_numpy(dtype=bool)
         elif reward_filter == "No numeric amount":
-            filtered = filtered[~has_amount]
+            mask &= (~has_amount).to_numpy(dtype=bool)
 
-    if race_filter != "All" and "race" in filtered.columns:
+    if race_filter != "All" and "race" in df.columns:
         if race_filter == "Unknown":
-            filtered = filtered[filtered["race"].isna() | (filtered["race"] == "")]
+            mask &= (df["race"].isna() | (df["race"] == "")).to_numpy(dtype=bool)
         else:
-            filtered = filtered[filtered["race"] == race_filter]
+            mask &= (df["race"] == race_filter).to_numpy(dtype=bool)
 
     if start_date and end_date:
-        pub = filtered["publication_dt"]
-        filtered = filtered[pub.notna() & (pub.dt.date >= start_date) & (pub.dt.date <= end_date)]
+        # Compare against day bounds as Timestamps instead of converting every row to a Python date;
+        # NaT compares False, so missing dates drop out as before
+        pub = df["publication_dt"]
+        start = pd.Timestamp(start_date, tz=pub.dt.tz)
+        end = pd.Timestamp(end_date, tz=pub.dt.tz) + pd.Timedelta(days=1)
+        mask &= ((pub >= start) & (pub < end)).to_numpy(dtype=bool)
 
-    if subjects_selected and "subjects" in filtered.columns:
+    if subjects_selected and "subjects" in df.columns:
+        # One row per (listing, subject) tag, then collapse back to "any tag selected" per listing
+        exploded = st.session_state["subjects_exploded"]
+        has_any_subject = exploded.isin(subjects_selected).groupby(level=0).any()
+        mask &= has_any_subject.reindex(df.index, fill_value=False).to_numpy(dtype=bool)
 
-        def _has_any_subject(x) -> bool:
-            if isinstance(x, list):
-                return any(s in x for s in subjects_selected)
-            return False
-
-        filtered = filtered[filtered["subjects"].apply(_has_any_subject)]
+    filtered = df if mask.all() else df[mask]
 
     # -----------------------------
     # Overview section
@@ -228,11 +271,9 @@ def main() -> None:
         "This answers whether postings cluster in certain time windows."
     )
 
-    # FIX: avoid renaming publication_dt -> publication (creates duplicate publication columns)
-    rq1_input = filtered.copy()
-    rq1_input["pub_for_trend"] = rq1_input["publication_dt"]
-
-    rq1 = rq4_volume_trend(rq1_input, date_col="pub_for_trend", freq="M")
+    # Trend on publication_dt directly (renaming it to publication would create duplicate columns)
+    publication_month = st.session_state["publication_month"]
+    rq1 = rq4_volume_trend(filtered, date_col="publication_dt", freq="M", period=publication_month)
 
     if rq1.empty:
         st.info("Not enough publication dates available after filtering to plot RQ1.")
@@ -255,15 +296,9 @@ def main() -> None:
     if "field_offices" not in filtered.columns:
         st.info("field_offices column not available in the current pull.")
     else:
-        tmp = filtered.copy()
-        tmp["field_offices"] = tmp["field_offices"].apply(
-            lambda x: x if isinstance(x, list) else ([] if x is None else [str(x)])
-        )
-        tmp = tmp.explode("field_offices")
-        tmp["field_offices"] = tmp["field_offices"].fillna("").astype(str).str.strip()
-        tmp = tmp[tmp["field_offices"] != ""]
-
-        top_offices = tmp["field_offices"].value_counts().head(20)
+        tags = st.session_state["field_offices_tags"]
+        office_counts = tags[tags.index.isin(filtered.index)].value_counts()
+        top_offices = office_counts[office_counts > 0].head(20)
         st.bar_chart(top_offices)
         st.caption("This shows concentration, not causality. A field office tag can reflect jurisdiction or investigation ownership.")
 
@@ -310,12 +345,13 @@ def main() -> None:
         freq_label = st.selectbox("Time grain", ["Monthly", "Weekly", "Quarterly"], index=0)
         freq = {"Weekly": "W", "Monthly": "M", "Quarterly": "Q"}[freq_label]
 
-    # FIX: avoid renaming publication_dt -> publication
-    rq4_input = filtered.copy()
-    rq4_input["pub_for_trend"] = rq4_input["publication_dt"]
-
     try:
-        rq4_trend = rq4_reward_trend(rq4_input, date_col="pub_for_trend", freq=freq)
+        rq4_trend = rq4_reward_trend(
+            filtered,
+            date_col="publication_dt",
+            freq=freq,
+            period=publication_month if freq == "M" else None,
+        )
     except Exception as e:
         rq4_trend = pd.DataFrame()
         st.warning(f"RQ4 trend failed: {e}")
@@ -1,14 +1,19 @@
 import pandas as pd
+import pytest
+import requests
 
 from fbi_wanted_analysis import fetch_current_wanted, clean_wanted
 from fbi_wanted_analysis.analysis import (
     run_analysis_pipeline,
+    quantity_over_time,
+    geographic_concentration_over_time,
     reward_by_crime_type,
     rq4_volume_trend,
     rq4_reward_trend,
     rq4_priority_by_subject,
     rq4_priority_by_program,
     rq4_priority_by_field_office,
+    time_grain,
 )
 
 
@@ -18,14 +23,93 @@ def test_package_exports_are_callable():
     assert callable(clean_wanted)
 
 
+def test_fetch_current_wanted_combines_pages_in_order(monkeypatch):
+    class FakeResponse:
+        def __init__(self, page):
+            self.page = page
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"items": [{"uid": f"p{self.page}", "title": f"Page {self.page}", "images": []}]}
+
+    def fake_get(self, url, params=None, timeout=None):
+        return FakeResponse(params["page"])
+
+    monkeypatch.setattr(requests.Session, "get", fake_get)
+
+    df = fetch_current_wanted(page_size=1, pages=3)
+
+    # Pages are fetched concurrently but rows keep page order
+    assert list(df["uid"]) == ["p1", "p2", "p3"]
+    # Only the project columns are kept
+    assert list(df.columns) == ["uid", "title"]
+    # Text fields come back Arrow-backed
+    assert isinstance(df["title"].dtype, pd.ArrowDtype)
+
+
+def test_fetch_current_wanted_keeps_uncastable_text_field_as_objects(monkeypatch):
+    class FakeResponse:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"items": [{"uid": "a", "race": "white"}, {"uid": "b", "race": ["black", "white"]}]}
+
+    monkeypatch.setattr(requests.Session, "get", lambda self, url, params=None, timeout=None: FakeResponse())
+
+    df = fetch_current_wanted(page_size=2, pages=1)
+
+    assert df["race"].tolist() == ["white", ["black", "white"]]
+    assert df["race"].dtype == object
+    # The other text fields still come back Arrow-backed
+    assert isinstance(df["uid"].dtype, pd.ArrowDtype)
+
+
 def test_run_analysis_pipeline_prints_message(capsys):
     run_analysis_pipeline()
     captured = capsys.readouterr()
     assert "Running analysis pipeline..." in captured.out
 
 
-def _fake_cleaned_df_for_rewards():
-    # Small helper DF used by multiple tests
+def test_quantity_over_time_counts_unique_listings_per_snapshot():
+    df = pd.DataFrame(
+        {
+            "snapshot_date": ["2024-01-01", "2024-01-01", "2024-01-01", "2024-02-01T00:00:00"],
+            "uid": [1, 2, 2, 1],
+        }
+    )
+
+    out = quantity_over_time(df)
+
+    assert pd.api.types.is_datetime64_any_dtype(out["snapshot_date"])
+    assert out["total_listings"].tolist() == [2, 1]
+
+
+def test_geographic_concentration_over_time_computes_shares():
+    df = pd.DataFrame(
+        {
+            "snapshot_date": ["2024-01-01"] * 4 + ["2024-02-01"] * 2,
+            "uid": [1, 2, 3, 4, 1, 5],
+            "state": ["UT", "UT", "UT", "CO", "UT", None],
+        }
+    )
+
+    out = geographic_concentration_over_time(df, geography="state")
+
+    jan = out[out["snapshot_date"] == "2024-01-01"].set_index("state")
+    assert jan.loc["UT", "listings"] == 3
+    assert jan.loc["UT", "share"] == 0.75
+    assert jan.loc["CO", "share"] == 0.25
+    # Rows without geography are dropped before shares are computed
+    feb = out[out["snapshot_date"] == "2024-02-01"]
+    assert feb["share"].tolist() == [1.0]
+
+
+@pytest.fixture(scope="session")
+def cleaned_df():
+    # Small cleaned-style DF shared by the reward/RQ4 tests; built once per session, so copy before mutating
     return pd.DataFrame(
         {
             "uid": [1, 2, 3],
@@ -52,20 +136,18 @@ def _fake_cleaned_df_for_rewards():
     )
 
 
-def test_reward_by_crime_type_basic_stats():
-    df = _fake_cleaned_df_for_rewards()
+def test_reward_by_crime_type_basic_stats(cleaned_df):
+    df = cleaned_df
 
-    out = reward_by_crime_type(df)
+    out = reward_by_crime_type(df).set_index("crime_type")
 
     # Should contain separate rows for each subject tag
-    crime_types = set(out["crime_type"])
-    assert {"Terrorism", "Bombing", "Kidnapping"}.issubset(crime_types)
+    assert {"Terrorism", "Bombing", "Kidnapping"}.issubset(out.index)
 
     # Terrorism appears on uid 1 and 2 with rewards 100k and 50k
-    terrorism_row = out[out["crime_type"] == "Terrorism"].iloc[0]
-    assert terrorism_row["median_reward"] == 75_000  # median of [50k, 100k]
-    assert terrorism_row["max_reward"] == 100_000
-    assert terrorism_row["listings"] == 2
+    assert out.at["Terrorism", "median_reward"] == 75_000  # median of [50k, 100k]
+    assert out.at["Terrorism", "max_reward"] == 100_000
+    assert out.at["Terrorism", "listings"] == 2
 
 
 def test_rq4_volume_trend_groups_by_month():
@@ -95,72 +177,148 @@ def test_rq4_volume_trend_groups_by_month():
     assert feb_row["listings"] == 1
 
 
-def test_rq4_reward_trend_computes_percentages_and_stats():
-    df = _fake_cleaned_df_for_rewards().copy()
+_GRAIN_INPUTS = {
+    # offset strings: binned on their UTC time (the 2024-02-29 row falls in March)
+    "offset_strings": pd.Series(
+        ["2024-01-31T23:30:00+00:00", "2024-02-29T20:00:00-07:00", "2023-12-31T00:00:00+00:00", "not-a-date", None]
+    ),
+    "tz_aware": pd.Series(
+        pd.to_datetime(["2024-01-31 23:30", "2024-02-29 20:00", "2023-12-31 00:00", None, None]).tz_localize(
+            "US/Mountain"
+        )
+    ),
+}
+
+
+@pytest.mark.parametrize("freq", ["D", "W", "M", "Q", "Y"])
+@pytest.mark.parametrize("kind", list(_GRAIN_INPUTS))
+def test_time_grain_matches_period_bins(kind, freq):
+    df = pd.DataFrame({"publication": _GRAIN_INPUTS[kind]})
+
+    out = time_grain(df, date_col="publication", freq=freq)
+
+    utc = pd.to_datetime(df["publication"], errors="coerce", utc=True).dt.tz_localize(None)
+    expected = utc.dt.to_period(freq).dt.to_timestamp().rename("period")
+    pd.testing.assert_series_equal(out, expected)
+    assert out.isna().tolist() == [False, False, False, True, True]
+
+
+def test_rq4_reward_trend_computes_percentages_and_stats(cleaned_df):
+    df = cleaned_df.copy()
     # Make sure publication is parseable datetimes
     df["publication"] = pd.to_datetime(df["publication"])
 
-    out = rq4_reward_trend(df, date_col="publication", freq="M")
+    out = rq4_reward_trend(df, date_col="publication", freq="M").set_index("period")
 
     # Expect at least one row per month with data
     assert not out.empty
 
     # Check January row (two entries, both with text and amount)
-    jan = out[out["period"].dt.month == 1].iloc[0]
-    assert jan["listings"] == 2
-    assert jan["pct_with_reward_text"] == 100.0
-    assert jan["pct_with_numeric_reward"] == 100.0
+    jan = pd.Timestamp("2024-01-01")
+    assert out.at[jan, "listings"] == 2
+    assert out.at[jan, "pct_with_reward_text"] == 100.0
+    assert out.at[jan, "pct_with_numeric_reward"] == 100.0
     # Rewards for Jan are 100k and 50k
-    assert jan["median_reward_max_usd"] == 75_000
-    assert jan["max_reward_max_usd"] == 100_000
+    assert out.at[jan, "median_reward_max_usd"] == 75_000
+    assert out.at[jan, "max_reward_max_usd"] == 100_000
+
+
+def test_rq4_trends_reuse_precomputed_period_on_filtered_rows(cleaned_df):
+    df = cleaned_df.copy()
+    df["publication"] = pd.to_datetime(df["publication"])
+    month = time_grain(df, date_col="publication", freq="M")
+    subset = df.iloc[1:]
+
+    volume = rq4_volume_trend(subset, date_col="publication", freq="M", period=month)
+    trend = rq4_reward_trend(subset, date_col="publication", freq="M", period=month)
+
+    pd.testing.assert_frame_equal(volume, rq4_volume_trend(subset, date_col="publication", freq="M"))
+    pd.testing.assert_frame_equal(trend, rq4_reward_trend(subset, date_col="publication", freq="M"))
+    assert volume["listings"].sum() == len(subset)
 
 
-def test_rq4_priority_by_subject_ranks_subjects():
-    df = _fake_cleaned_df_for_rewards()
+def test_rq4_priority_by_subject_ranks_subjects(cleaned_df):
+    df = cleaned_df
 
-    out = rq4_priority_by_subject(df, top_n=5)
+    out = rq4_priority_by_subject(df, top_n=5).set_index("subject")
 
     # Should include Terrorism and Kidnapping
-    subjects = set(out["subject"])
-    assert "Terrorism" in subjects
-    assert "Kidnapping" in subjects
+    assert "Terrorism" in out.index
+    assert "Kidnapping" in out.index
 
     # Terrorism should have more listings than Kidnapping
-    terrorism_listings = out.loc[out["subject"] == "Terrorism", "listings"].iloc[0]
-    kidnapping_listings = out.loc[out["subject"] == "Kidnapping", "listings"].iloc[0]
-    assert terrorism_listings > kidnapping_listings
+    assert out.at["Terrorism", "listings"] > out.at["Kidnapping", "listings"]
+
+
+def test_rq4_priority_by_subject_falls_back_to_cleaned_arrow_subjects():
+    raw = pd.DataFrame(
+        {
+            "uid": [1, 2, 3],
+            "subjects": [["Terrorism", "Bombing"], ["Terrorism"], ["Kidnapping"]],
+            "reward_text": ["The FBI is offering a reward of up to $10,000.", None, None],
+        }
+    )
+    # A cleaned frame without subject_primary: subjects is an Arrow list column
+    df = clean_wanted(raw).drop(columns="subject_primary")
+
+    out = rq4_priority_by_subject(df, top_n=5).set_index("subject")
+
+    assert out["listings"].to_dict() == {"Terrorism": 2, "Kidnapping": 1}
 
 
-def test_rq4_priority_by_program_counts_text_and_amounts():
-    df = _fake_cleaned_df_for_rewards()
+def test_rq4_priority_by_program_counts_text_and_amounts(cleaned_df):
+    df = cleaned_df
 
-    out = rq4_priority_by_program(df)
+    out = rq4_priority_by_program(df).set_index("reward_program")
 
-    programs = set(out["reward_program"])
-    assert "FBI" in programs
-    assert "Rewards for Justice" in programs
+    assert "FBI" in out.index
+    assert "Rewards for Justice" in out.index
 
-    fbi_row = out[out["reward_program"] == "FBI"].iloc[0]
     # Two FBI rows, both with text and amount
-    assert fbi_row["listings_with_text"] == 2
-    assert fbi_row["listings_with_amount"] == 2
-    assert fbi_row["median_reward_max_usd"] == 75_000
-    assert fbi_row["max_reward_max_usd"] == 100_000
+    assert out.at["FBI", "listings_with_text"] == 2
+    assert out.at["FBI", "listings_with_amount"] == 2
+    assert out.at["FBI", "median_reward_max_usd"] == 75_000
+    assert out.at["FBI", "max_reward_max_usd"] == 100_000
 
 
-def test_rq4_priority_by_field_office_explodes_lists():
-    df = _fake_cleaned_df_for_rewards()
+def test_rq4_priority_by_field_office_counts_each_cleaned_office():
+    raw = pd.DataFrame(
+        {
+            "uid": [1, 2, 3],
+            "field_offices": [["denver", "saltlakecity"], ["denver"], None],
+            "reward_text": ["The FBI is offering a reward of up to $10,000.", None, None],
+        }
+    )
 
-    out = rq4_priority_by_field_office(df, top_n=10)
+    out = rq4_priority_by_field_office(clean_wanted(raw), top_n=10)
 
-    offices = set(out["field_office"])
-    # denver appears on two rows (uid 1 and 2)
-    assert "denver" in offices
+    listings = dict(zip(out["field_office"], out["listings"]))
+    assert listings == {"denver": 2, "saltlakecity": 1, "Unknown": 1}
+
+
+def test_rq4_priority_by_field_office_explodes_lists(cleaned_df):
+    df = cleaned_df
+
+    out = rq4_priority_by_field_office(df, top_n=10).set_index("field_office")
 
-    denver_row = out[out["field_office"] == "denver"].iloc[0]
-    assert denver_row["listings"] == 2
+    # denver appears on two rows (uid 1 and 2)
+    assert "denver" in out.index
+    assert out.at["denver", "listings"] == 2
 
     # newyork appears once
-    assert "newyork" in offices
-    ny_row = out[out["field_office"] == "newyork"].iloc[0]
-    assert ny_row["listings"] == 1
+    assert "newyork" in out.index
+    assert out.at["newyork", "listings"] == 1
+
+
+def test_snapshot_summaries_accept_non_iso_snapshot_dates():
+    df = pd.DataFrame(
+        {
+            "snapshot_date": ["01/02/2024", "01/02/2024", "01/09/2024"],
+            "uid": [1, 2, 1],
+            "field_office": ["denver", "miami", "denver"],
+        }
+    )
+
+    assert quantity_over_time(df)["total_listings"].tolist() == [2, 1]
+    shares = geographic_concentration_over_time(df, "field_office")
+    assert shares["snapshot_date"].tolist()[-1] == pd.Timestamp("2024-01-09")
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from fbi_wanted_analysis.cleaning import clean_wanted, run_cleaning_pipeline
 
@@ -47,3 +48,127 @@ def test_clean_wanted_parses_publication_and_field_offices_and_rewards():
     assert not bool(cleaned.loc[1, "reward_has_text"])
     assert not bool(cleaned.loc[1, "reward_has_amount"])
 
+
+def test_clean_wanted_stores_low_cardinality_labels_as_category():
+    raw = pd.DataFrame(
+        {
+            "uid": [1, 2, 3],
+            "sex": ["Male", "Female", None],
+            "race": ["white", "white", "black"],
+            "field_offices": [["denver"], ["denver"], None],
+            "reward_text": ["The FBI is offering a reward of up to $10,000.", None, None],
+        }
+    )
+
+    cleaned = clean_wanted(raw)
+
+    for col in ("sex", "race", "field_offices", "reward_program"):
+        assert isinstance(cleaned[col].dtype, pd.CategoricalDtype)
+
+    # values and missing markers are unchanged by the dtype
+    assert (cleaned["sex"] == "Male").tolist() == [True, False, False]
+    assert pd.isna(cleaned.loc[2, "sex"])
+    assert cleaned["field_offices"].tolist() == ["denver", "denver", ""]
+    assert cleaned["reward_program"].tolist() == ["FBI", "Other/Unknown", "Other/Unknown"]
+
+
+def test_clean_wanted_derives_primary_subject():
+    raw = pd.DataFrame(
+        {
+            "uid": [1, 2, 3],
+            "subjects": [["Terrorism", "Bombing"], [], None],
+        }
+    )
+
+    cleaned = clean_wanted(raw)
+
+    assert cleaned["subject_primary"].tolist() == ["Terrorism", "Unknown", "Unknown"]
+
+
+def test_clean_wanted_stores_subjects_as_arrow_lists():
+    raw = pd.DataFrame(
+        {
+            "uid": [1, 2, 3, 4],
+            "subjects": [["Terrorism", "Bombing"], "Kidnapping", [], None],
+        }
+    )
+
+    cleaned = clean_wanted(raw)
+
+    assert isinstance(cleaned["subjects"].dtype, pd.ArrowDtype)
+    assert cleaned["subjects"].iloc[0] == ["Terrorism", "Bombing"]
+    assert cleaned["subjects"].iloc[1] == ["Kidnapping"]
+    assert cleaned["subjects"].iloc[2] == []
+    assert pd.isna(cleaned["subjects"].iloc[3])
+    assert cleaned["subjects"].explode().dropna().tolist() == ["Terrorism", "Bombing", "Kidnapping"]
+
+
+def test_clean_wanted_stores_reward_amounts_as_float():
+    raw = pd.DataFrame({"uid": [1, 2], "reward_text": ["Up to $5 million", None]})
+
+    cleaned = clean_wanted(raw)
+
+    for col in ("reward_amount_min_usd", "reward_amount_max_usd"):
+        assert cleaned[col].dtype == "float64"
+    assert cleaned["reward_amount_max_usd"].tolist()[0] == 5_000_000
+    assert pd.isna(cleaned.loc[1, "reward_amount_max_usd"])
+
+
+def test_clean_wanted_handles_empty_frame():
+    cleaned = clean_wanted(pd.DataFrame({"uid": [], "reward_text": []}))
+
+    assert cleaned.empty
+    assert {"reward_has_amount", "reward_amount_max_usd", "reward_program"} <= set(cleaned.columns)
+
+
+def test_clean_wanted_accepts_already_cleaned_subjects():
+    raw = pd.DataFrame(
+        {
+            "uid": [1, 2],
+            "subjects": [["Terrorism", "Bombing"], ["Kidnapping"]],
+            "field_offices": [["denver"], ["miami"]],
+        }
+    )
+
+    recleaned = clean_wanted(clean_wanted(raw)[["uid", "subjects", "field_offices"]])
+
+    assert recleaned["subject_primary"].tolist() == ["Terrorism", "Kidnapping"]
+    assert recleaned["subjects"].tolist() == [["Terrorism", "Bombing"], ["Kidnapping"]]
+    # field_offices comes back categorical without an "" category
+    assert recleaned["field_offices"].tolist() == ["denver", "miami"]
+    assert isinstance(recleaned["field_offices"].dtype, pd.CategoricalDtype)
+
+
+def test_clean_wanted_drops_null_tags():
+    raw = pd.DataFrame(
+        {
+            "uid": [1, 2],
+            "subjects": [["Terrorism", None], ["Fraud"]],
+            "field_offices": [["denver", None], ["miami"]],
+        }
+    )
+
+    cleaned = clean_wanted(raw)
+
+    assert cleaned["subjects"].tolist() == [["Terrorism"], ["Fraud"]]
+    assert cleaned["field_offices_list"].tolist() == [["denver"], ["miami"]]
+    assert cleaned["field_offices"].tolist() == ["denver", "miami"]
+
+
+def test_clean_wanted_parses_numpy_str_publication():
+    raw = pd.DataFrame({"uid": [1, 2], "publication": [np.str_("2024-01-05"), np.str_("bad")]})
+
+    cleaned = clean_wanted(raw)
+
+    assert cleaned["publication"].iloc[0] == pd.Timestamp("2024-01-05")
+    assert pd.isna(cleaned["publication"].iloc[1])
+
+
+def test_clean_wanted_joins_list_valued_race():
+    raw = pd.DataFrame({"uid": [1, 2, 3], "race": ["white", ["black", "white"], None]})
+
+    cleaned = clean_wanted(raw)
+
+    assert cleaned["race"].tolist()[:2] == ["white", "black, white"]
+    assert pd.isna(cleaned["race"].iloc[2])
+    assert isinstance(cleaned["race"].dtype, pd.CategoricalDtype)